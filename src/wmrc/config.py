@@ -3,31 +3,96 @@ config.py: Configuration values. Secrets to be handled with Secrets Manager
 """
 
 import logging
+import os
 import socket
+import tempfile
+import threading
+import time
 import urllib.request
+from pathlib import Path
 
 SKID_NAME = "wmrc"
-#: Try to get project id from GCP metadata server for hostname. If it's empty or errors out, revert to local hostname
-try:
+PROJECT_ID_CACHE = Path("/tmp/wmrc-project-id")
+PROJECT_ID_CACHE_MAX_AGE = 60 * 60  #: seconds
+SALESFORCE_COLUMNS_CACHE = Path("/tmp/wmrc-sf-columns.json")
+SALESFORCE_COLUMNS_CACHE_MAX_AGE = 24 * 60 * 60  #: seconds
+
+
+def _fetch_project_id() -> str:
+    """Get the project id from the GCP metadata server and write it to the on-disk cache.
+
+    Raises:
+        ValueError: If the metadata server returns an empty project id
+
+    Returns:
+        str: The GCP project id
+    """
+
     url = "http://metadata.google.internal/computeMetadata/v1/project/project-id"
     req = urllib.request.Request(url)
     req.add_header("Metadata-Flavor", "Google")
-    project_id = urllib.request.urlopen(req).read().decode()
+    project_id = urllib.request.urlopen(req, timeout=0.25).read().decode()
     if not project_id:
-        raise ValueError
-    HOST_NAME = project_id
-except Exception:
-    HOST_NAME = socket.gethostname()
+        raise ValueError("Empty project id from metadata server")
+
+    #: Write to a uniquely-named temp file and swap it in so readers (and concurrent refreshes) never see a partial
+    #: file. Caching is best-effort.
+    try:
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=PROJECT_ID_CACHE.parent, prefix=PROJECT_ID_CACHE.name, delete=False
+        ) as temp_cache:
+            temp_cache.write(project_id)
+        try:
+            os.replace(temp_cache.name, PROJECT_ID_CACHE)
+        except OSError:
+            os.unlink(temp_cache.name)
+            raise
+    except OSError:
+        logging.getLogger(SKID_NAME).debug("Could not cache the project id", exc_info=True)
+
+    return project_id
+
+
+def _refresh_project_id():
+    """Background target for refreshing the cached project id; failures are logged at debug level and ignored."""
+    try:
+        _fetch_project_id()
+    except Exception:
+        logging.getLogger(SKID_NAME).debug("Could not refresh the cached project id", exc_info=True)
+
+
+def _resolve_host_name() -> str:
+    """Get the GCP project id for the hostname, falling back to the local hostname.
+
+    Uses a stale-while-revalidate cache: a fresh cached value is returned as-is, a stale one is returned immediately
+    while a background thread refreshes it. Without a cached value the metadata server is queried with a short
+    timeout; if that fails (empty or errors out), the local hostname is returned and the refresh retried in the
+    background.
+
+    Returns:
+        str: The GCP project id or the local hostname
+    """
+
+    try:
+        cached_project_id = PROJECT_ID_CACHE.read_text(encoding="utf-8")
+        cache_age = time.time() - PROJECT_ID_CACHE.stat().st_mtime
+    except OSError:
+        cached_project_id = ""
+
+    if cached_project_id:
+        if cache_age >= PROJECT_ID_CACHE_MAX_AGE:
+            threading.Thread(target=_refresh_project_id, daemon=True).start()
+        return cached_project_id
+
+    try:
+        return _fetch_project_id()
+    except Exception:
+        logging.getLogger(SKID_NAME).debug("Could not get the project id, using the local hostname", exc_info=True)
+        threading.Thread(target=_refresh_project_id, daemon=True).start()
+        return socket.gethostname()
+
 
 AGOL_ORG = "https://utahdeq.maps.arcgis.com"
-SENDGRID_SETTINGS = {  #: Settings for SendGridHandler
-    "from_address": "noreply@utah.gov",
-    "to_addresses": [
-        "ugrc-developers@utah.gov",
-        "deq-wmrc-recycling-map@utah.gov",
-    ],
-    "prefix": f"{SKID_NAME} on {HOST_NAME}: ",
-}
 LOG_LEVEL = logging.DEBUG
 LOG_FILE_NAME = "log"
 
@@ -45,3 +110,28 @@ COMPOSTING_LAYER_ITEMID = "9b543c20de704839b90502a49ce1b8f3"
 STATEWIDE_LAYER_ITEMID = "a5abaa46850e46ff88ee6024ce21f52e"
 
 YEAR = 2023
+
+
+def __getattr__(name):
+    """Lazily build HOST_NAME and SENDGRID_SETTINGS on first access so importing config does no network work.
+
+    The computed value is stored in the module globals so later lookups don't come back through here.
+    """
+
+    if name == "HOST_NAME":
+        value = _resolve_host_name()
+    elif name == "SENDGRID_SETTINGS":
+        host_name = globals().get("HOST_NAME") or __getattr__("HOST_NAME")
+        value = {  #: Settings for SendGridHandler
+            "from_address": "noreply@utah.gov",
+            "to_addresses": [
+                "ugrc-developers@utah.gov",
+                "deq-wmrc-recycling-map@utah.gov",
+            ],
+            "prefix": f"{SKID_NAME} on {host_name}: ",
+        }
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
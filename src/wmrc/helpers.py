@@ -1,8 +1,28 @@
-from typing import Mapping
+import itertools
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import TYPE_CHECKING, Mapping
 
-import palletjack
 import pandas as pd
 
+try:
+    from wmrc import config
+except ImportError:
+    import config
+
+if TYPE_CHECKING:
+    import palletjack
+
+#: Skips the three-character prefix and any leading zeros of a facility id (SWF0123 -> 123) in a single pass
+_FACILITY_ID_NUMBER_REGEX = re.compile(r"^.{0,3}0*(.*)$", re.DOTALL)
+
+#: Converts a manual report alias to its Salesforce field name (minus the __c suffix)
+_FIELD_NAME_TRANSLATION = str.maketrans({" ": "_", "(": None, ")": None, "-": "_", "/": None})
+
 
 def convert_to_int(s):
     """Convert a string to an integer. If the string cannot be converted, return -1."""
@@ -12,9 +32,46 @@ def convert_to_int(s):
         return -1
 
 
+def convert_series_to_int(series: pd.Series) -> pd.Series:
+    """Convert a series (or index) of strings to integers, using -1 for any values that cannot be converted.
+
+    Vectorized replacement for .apply(convert_to_int). Values are parsed with pd.to_numeric, so numeric strings with a
+    whole-number value like "2022.0" or "2e3" are converted; non-integral values like "2022.5" become -1 rather than
+    being truncated.
+
+    Args:
+        series (pd.Series): Series or Index of values to convert
+
+    Returns:
+        pd.Series: The converted values as int64
+    """
+
+    numeric = pd.to_numeric(series, errors="coerce")
+    return numeric.where(numeric % 1 == 0).fillna(-1).astype("int64")
+
+
+def facility_id_number(facility_ids: pd.Series) -> pd.Series:
+    """Get the number part of Salesforce facility ids (SWF0123 -> 123) for use as the id_ join key.
+
+    Both the facility summaries and the facility info are keyed on this value, so they must use this one function to
+    derive it.
+
+    Args:
+        facility_ids (pd.Series): Salesforce Solid_Waste_Facility_ID_Number__c values
+
+    Returns:
+        pd.Series: The ids with the three-character prefix and any leading zeros removed
+    """
+
+    return facility_ids.astype(str).str.extract(_FACILITY_ID_NUMBER_REGEX, expand=False)
+
+
 def add_bogus_geometries(input_dataframe: pd.DataFrame) -> pd.DataFrame:
     """Add a bogus geometry (point in downtown Malad City, ID) to a dataframe in WKID 4326.
 
+    Every row gets the same point, so the geometries are built directly instead of going through from_xy. The
+    input_dataframe is modified in place.
+
     Args:
         input_dataframe (pd.DataFrame): Non-spatial dataframe to add geometry to
 
@@ -22,14 +79,16 @@ def add_bogus_geometries(input_dataframe: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: Spatially-enabled dataframe version of input input_dataframe with geometry added to every row
     """
 
-    input_dataframe["x"] = 12_495_000
-    input_dataframe["y"] = 5_188_000
+    #: arcgis is only needed here, so don't make every import of helpers pay for loading it
+    from arcgis.geometry import Point
 
-    spatial_dataframe = pd.DataFrame.spatial.from_xy(input_dataframe, "x", "y", sr=4326)
+    bogus_point = {"x": 12_495_000, "y": 5_188_000, "spatialReference": {"wkid": 4326}}
 
-    spatial_dataframe.drop(columns=["x", "y"], inplace=True)
+    #: Separate Point objects per row so nothing downstream can modify every row's geometry at once
+    input_dataframe["SHAPE"] = [Point(bogus_point) for _ in range(len(input_dataframe))]
+    input_dataframe.spatial.set_geometry("SHAPE")
 
-    return spatial_dataframe
+    return input_dataframe
 
 
 class SalesForceRecords:
@@ -37,7 +96,9 @@ class SalesForceRecords:
     the data through the .df attribute along with the field mapping and list of counties.
     """
 
-    def __init__(self, salesforce_extractor: palletjack.extract.SalesforceRestLoader):
+    __slots__ = ("county_fields", "df", "field_mapping", "salesforce_extractor")
+
+    def __init__(self, salesforce_extractor: "palletjack.extract.SalesforceRestLoader"):
         self.salesforce_extractor = salesforce_extractor
         self.field_mapping: Mapping[str, str] = {}
         self.county_fields: list[str] = []
@@ -54,13 +115,41 @@ class SalesForceRecords:
         fields_string = self._build_columns_string()
 
         #: Main query with just our desired fields
-        self.df = self.salesforce_extractor.get_records(
-            "services/data/v60.0/query/",
+        self.df = self._get_records(
             f"SELECT {fields_string} from Application_Report__c WHERE Status__c = 'Submitted' AND RecordType.Name = 'Annual Report'",
         )
 
-        #: Extract the facility id from the nested salesforce object
-        self.df["facility_id"] = self.df["Facility__r"].apply(lambda x: x["Solid_Waste_Facility_ID_Number__c"])
+        #: Extract the facility id from the nested salesforce object (which is None if the report has no facility)
+        self.df["facility_id"] = [
+            facility["Solid_Waste_Facility_ID_Number__c"] if facility else None
+            for facility in self.df["Facility__r"].to_numpy()
+        ]
+
+        #: Only a handful of distinct classifications, so store them as a categorical; the per-year classification
+        #: filters then compare integer codes instead of strings
+        self.df["Classifications__c"] = self.df["Classifications__c"].astype("category")
+
+    def _get_records(self, query_string: str) -> pd.DataFrame:
+        """Run a SOQL query, following the nextRecordsUrl cursor through all the result pages.
+
+        The records from every page are collected first and turned into a dataframe once at the end rather than
+        concatenating a new dataframe onto the results for each page.
+
+        Args:
+            query_string (str): A SOQL query string
+
+        Returns:
+            pd.DataFrame: All the records returned by the query
+        """
+
+        response_data = self.salesforce_extractor._query_records("services/data/v60.0/query/", {"q": query_string})
+        records = response_data["records"]
+
+        while not response_data["done"]:
+            response_data = self.salesforce_extractor._query_records(response_data["nextRecordsUrl"])
+            records.extend(response_data["records"])
+
+        return pd.DataFrame(records)
 
     def _build_columns_string(self) -> str:
         """Build a string of needed columns for the SOQL query based on field mapping and some custom fields
@@ -79,25 +168,71 @@ class SalesForceRecords:
             "Facility_Website__c",
         ]
 
-        fields_string = ",".join(list(self.field_mapping.values()) + additional_fields + self.county_fields)
+        #: SOQL rejects a query that selects the same field twice, so dedupe (keeping order) in case a mapped field is
+        #: also one of the additional or county fields
+        fields_string = ",".join(
+            dict.fromkeys(itertools.chain(self.field_mapping.values(), additional_fields, self.county_fields))
+        )
 
         return fields_string
 
+    def _get_salesforce_columns(self) -> list[str]:
+        """Get the names of all the Application_Report__c fields from the sObject describe endpoint.
+
+        The describe endpoint only returns field metadata, so we don't have to pull any records just to get the column
+        names. The names are cached on disk at config.SALESFORCE_COLUMNS_CACHE along with the org they came from so
+        warm starts against the same org within config.SALESFORCE_COLUMNS_CACHE_MAX_AGE seconds can skip the request
+        entirely.
+
+        Returns:
+            list[str]: Names of all the fields on the Application_Report__c object
+        """
+
+        cache = config.SALESFORCE_COLUMNS_CACHE
+        org_url = self.salesforce_extractor.org_url
+        try:
+            if time.time() - cache.stat().st_mtime < config.SALESFORCE_COLUMNS_CACHE_MAX_AGE:
+                cached = json.loads(cache.read_text(encoding="utf-8"))
+                if cached["org_url"] == org_url:
+                    return cached["columns"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        describe_data = self.salesforce_extractor._query_records(
+            "services/data/v60.0/sobjects/Application_Report__c/describe/"
+        )
+        columns = [field["name"] for field in describe_data["fields"]]
+
+        #: Write to a uniquely-named temp file and swap it in so readers (and concurrent writers) never see a partial
+        #: file. Caching is best-effort.
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=cache.parent, prefix=cache.name, delete=False
+            ) as temp_cache:
+                json.dump({"org_url": org_url, "columns": columns}, temp_cache)
+            try:
+                os.replace(temp_cache.name, cache)
+            except OSError:
+                os.unlink(temp_cache.name)
+                raise
+        except OSError:
+            logging.getLogger(config.SKID_NAME).debug("Could not cache the Salesforce columns", exc_info=True)
+
+        return columns
+
     def _build_field_mapping(self):
         """Map names from manual reports to Salesforce field names.
 
-        Queries Salesforce for the first 200 records to get all the column names. Then maps field names from manual
+        Gets all the column names from the Application_Report__c describe metadata. Then maps field names from manual
         report runs to the Salesforce column names.
 
         Raises:
             ValueError: If a field from the manual reports is not found in the Salesforce columns
         """
 
-        #: Get a dataframe of the first 200 rows with all the columns so we can extract the needed columns
-        df_for_columns = self.salesforce_extractor.get_records(
-            "services/data/v60.0/query/", "SELECT FIELDS(ALL) from Application_Report__c LIMIT 1"
-        )
-        self.county_fields = [col for col in df_for_columns.columns if "_County" in col]
+        salesforce_field_names = self._get_salesforce_columns()
+        salesforce_columns = frozenset(salesforce_field_names)  #: For fast membership checks below
+        self.county_fields = [col for col in salesforce_field_names if "_County" in col]
         self.county_fields.append("Out_of_State__c")
 
         aliases = [
@@ -148,13 +283,9 @@ class SalesForceRecords:
             "Annual Recycling Contamination Rate",
         ]
         missing_fields = []
-        for alias in aliases:
-            if alias in self.field_mapping:
-                continue
-            field_name = (
-                f'{alias.replace(" ", "_").replace("(", "").replace(")", "").replace("-", "_").replace("/", "")}__c'
-            )
-            if field_name not in df_for_columns.columns:
+        for alias in dict.fromkeys(aliases):  #: Dedupe while keeping order
+            field_name = f"{alias.translate(_FIELD_NAME_TRANSLATION)}__c"
+            if field_name not in salesforce_columns:
                 missing_fields.append(alias)
                 continue
             self.field_mapping[alias] = field_name
@@ -173,21 +304,19 @@ class SalesForceRecords:
                 "2022, 2023", etc}
         """
 
+        #: Sort by last updated time once so we can both find the duplicates and keep the most recent record
+        self.df["LastModifiedDate"] = pd.to_datetime(self.df["LastModifiedDate"], format="ISO8601")
+        self.df = self.df.sort_values("LastModifiedDate")
+        duplicated_mask = self.df.duplicated(subset=["facility_id", "Calendar_Year__c"], keep=False)
+
         #: {"SW0123": "2022, 2023", etc}
-        duplicated_facility_ids = {
-            facility_id: ", ".join(years)
-            for facility_id, years in self.df[
-                self.df.duplicated(subset=["facility_id", "Calendar_Year__c"], keep=False)
-            ]
+        duplicated_facility_ids = (
+            self.df[duplicated_mask]
             .groupby("facility_id")["Calendar_Year__c"]
-            .unique()
-            .items()
-        }
-
-        #: Sort by last updated time and keep the most recent record
-        self.df["LastModifiedDate"] = pd.to_datetime(self.df["LastModifiedDate"])
-        self.df = self.df.sort_values("LastModifiedDate").drop_duplicates(
-            subset=["facility_id", "Calendar_Year__c"], keep="last"
+            .agg(lambda years: ", ".join(sorted({str(year) for year in years})))
+            .to_dict()
         )
 
+        self.df = self.df.drop_duplicates(subset=["facility_id", "Calendar_Year__c"], keep="last")
+
         return duplicated_facility_ids
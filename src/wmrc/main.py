@@ -7,6 +7,7 @@ import base64
 import json
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 from pathlib import Path
 from tempfile import TemporaryDirectory
@@ -34,6 +35,14 @@ except ImportError:
     import version
     import yearly
 
+#: Lowercased, AGOL-safe Google Sheet column names that differ from the live facility layer's field names
+_LIVE_FACILITY_FIELD_NAMES = {
+    "longitude_": "longitude",
+    "accept_material_dropped_off_by_the_public": "accept_material_dropped_off_by_",
+    "tons_of_material_diverted_from_landfills_last_year": "tons_of_material_diverted_from_",
+    "gallons_of_used_oil_collected_for_recycling_last_year": "gallons_of_used_oil_collected_f",
+}
+
 
 class Skid:
     def __init__(self):
@@ -98,6 +107,7 @@ class Skid:
         log_handler = logging.FileHandler(self.log_path, mode="w")
         log_handler.setLevel(config.LOG_LEVEL)
         log_handler.setFormatter(formatter)
+        self.log_file_handler = log_handler  #: Kept so it can be removed and closed before the tempdir is cleaned up
 
         skid_logger.addHandler(cli_handler)
         skid_logger.addHandler(log_handler)
@@ -111,8 +121,8 @@ class Skid:
 
         skid_logger.debug("Creating Supervisor object")
         self.supervisor = Supervisor(handle_errors=False)
-        sendgrid_settings = config.SENDGRID_SETTINGS
-        sendgrid_settings["api_key"] = self.secrets.SENDGRID_API_KEY
+        #: Copy so the api key doesn't end up in config's cached settings
+        sendgrid_settings = {**config.SENDGRID_SETTINGS, "api_key": self.secrets.SENDGRID_API_KEY}
         self.supervisor.add_message_handler(
             SendGridHandler(
                 sendgrid_settings=sendgrid_settings, client_name=config.SKID_NAME, client_version=version.__version__
@@ -123,26 +133,83 @@ class Skid:
         """A helper function to remove the file handlers so the tempdir will close correctly
 
         Args:
-            loggers (list[str]): The loggers that are writing to log_name
+            loggers (list[logging.Logger]): The loggers that are writing to log_name
         """
 
         for logger in loggers:
-            for handler in logger.handlers:
-                try:
-                    if self.log_name in handler.stream.name:
-                        logger.removeHandler(handler)
-                        handler.close()
-                except Exception:
-                    pass
+            logger.removeHandler(self.log_file_handler)
+        self.log_file_handler.close()
+
+    def _make_working_dir(self, name: str) -> Path:
+        """Create (if needed) and return a subdirectory of the tempdir for a single layer update
+
+        Args:
+            name (str): Name of the subdirectory
+
+        Returns:
+            Path: Path to the subdirectory
+        """
+
+        working_dir = self.tempdir_path / name
+        working_dir.mkdir(exist_ok=True)
+        return working_dir
+
+    def _get_gis(self) -> arcgis.gis.GIS:
+        """Log in to AGOL via the ArcGIS API for Python
+
+        Returns:
+            arcgis.gis.GIS: A new GIS object for the AGOL org
+        """
+
+        return arcgis.gis.GIS(config.AGOL_ORG, self.secrets.AGOL_USER, self.secrets.AGOL_PASSWORD)
+
+    def _run_updates(self, updates: dict[str, tuple]) -> dict[str, int]:
+        """Run layer updates concurrently and return their counts
+
+        Each update is called as update(gis, *args, working_dir=working_dir). arcgis doesn't document its GIS
+        connection as thread-safe, so each update gets its own GIS object. palletjack always stages its upload as
+        upload.gdb in the working dir, so each update also gets its own working dir named after the update.
+
+        Every update is allowed to finish, even if another fails, so that the log records each layer that failed. AGOL
+        loads can't be rolled back, so layers whose updates succeeded stay updated.
+
+        Args:
+            updates (dict[str, tuple]): Update name -> (update method, additional positional args...)
+
+        Raises:
+            Exception: The first error raised by any of the updates, after all of them have finished
+
+        Returns:
+            dict[str, int]: Update name -> the count returned by the update
+        """
+
+        def _run_update(name, update, *args):
+            return update(self._get_gis(), *args, working_dir=self._make_working_dir(name))
+
+        with ThreadPoolExecutor(max_workers=len(updates)) as executor:
+            futures = {name: executor.submit(_run_update, name, *update) for name, update in updates.items()}
+
+        counts = {}
+        errors = []
+        for name, future in futures.items():
+            error = future.exception()
+            if error is None:
+                counts[name] = future.result()
+                continue
+            self.skid_logger.error("Updating %s failed", name, exc_info=error)
+            errors.append(error)
+
+        if errors:
+            self.skid_logger.error("Layers that were updated successfully: %s", ", ".join(counts) or "none")
+            raise errors[0]
+
+        return counts
 
     def process(self):
         """The main method that does all the work."""
 
         start = datetime.now()
 
-        #: Get our GIS object via the ArcGIS API for Python
-        gis = arcgis.gis.GIS(config.AGOL_ORG, self.secrets.AGOL_USER, self.secrets.AGOL_PASSWORD)
-
         #: Load data from Salesforce and generate analyses using Summarize methods
         self.skid_logger.info("Loading records from Salesforce...")
         records = self._load_salesforce_data()
@@ -152,36 +219,22 @@ class Skid:
         materials_recycled_df = summarize.materials_recycled(records)
         materials_composted_df = summarize.materials_composted(records)
 
-        #: Facilities on map
-        self.skid_logger.info("Updating facility info...")
-        facilities_load_count = self._update_facilities(gis, facility_summary_df)
-
-        #: county summaries on map, dashboard:
-        self.skid_logger.info("Updating county info...")
-        counties_update_count = self._update_counties(gis, county_summary_df)
-
-        #: Materials recycled on dashboard:
-        self.skid_logger.info("Updating materials recycled...")
-        materials_spatial = helpers.add_bogus_geometries(materials_recycled_df)
-        materials_spatial.rename(columns={"percent": "percent_"}, inplace=True)
-        materials_loader = load.ServiceUpdater(gis, config.MATERIALS_LAYER_ITEMID, working_dir=self.tempdir_path)
-        materials_count = materials_loader.truncate_and_load(materials_spatial)
-
-        #:  Materials composted on dashboard:
-        self.skid_logger.info("Updating materials composted...")
-        composting_spatial = helpers.add_bogus_geometries(materials_composted_df)
-        composting_spatial.rename(columns={"percent": "percent_"}, inplace=True)
-        composting_loader = load.ServiceUpdater(gis, config.COMPOSTING_LAYER_ITEMID, working_dir=self.tempdir_path)
-        composting_count = composting_loader.truncate_and_load(composting_spatial)
-
         #: Statewide metrics
-        self.skid_logger.info("Updating statewide metrics...")
         statewide_totals_df = county_summary_df.groupby("data_year").apply(yearly.statewide_metrics)
         contamination_rates_df = summarize.recovery_rates_by_tonnage(records)
         statewide_metrics = pd.concat([statewide_totals_df, contamination_rates_df], axis=1)
-        statewide_spatial = helpers.add_bogus_geometries(statewide_metrics)
-        statewide_loader = load.ServiceUpdater(gis, config.STATEWIDE_LAYER_ITEMID, working_dir=self.tempdir_path)
-        statewide_count = statewide_loader.truncate_and_load(statewide_spatial)
+
+        #: The five layer updates are independent and mostly waiting on AGOL, so run them concurrently
+        self.skid_logger.info("Updating facility, county, materials, and statewide layers...")
+        update_counts = self._run_updates(
+            {
+                "facilities": (self._update_facilities, facility_summary_df),
+                "counties": (self._update_counties, county_summary_df),
+                "materials": (self._update_materials, materials_recycled_df, config.MATERIALS_LAYER_ITEMID),
+                "composting": (self._update_materials, materials_composted_df, config.COMPOSTING_LAYER_ITEMID),
+                "statewide": (self._update_statewide, statewide_metrics),
+            }
+        )
 
         end = datetime.now()
 
@@ -195,11 +248,11 @@ class Skid:
             f'End time: {end.strftime("%H:%M:%S")}',
             f"Duration: {str(end-start)}",
             "",
-            f"Facility rows loaded: {facilities_load_count}",
-            f"County rows loaded: {counties_update_count}",
-            f"Materials recycled rows loaded: {materials_count}",
-            f"Materials composted rows loaded: {composting_count}",
-            f"Statewide metrics rows loaded: {statewide_count}",
+            f"Facility rows loaded: {update_counts['facilities']}",
+            f"County rows loaded: {update_counts['counties']}",
+            f"Materials recycled rows loaded: {update_counts['materials']}",
+            f"Materials composted rows loaded: {update_counts['composting']}",
+            f"Statewide metrics rows loaded: {update_counts['statewide']}",
         ]
         if duplicate_facility_ids:
             summary_rows.insert(7, "Duplicate facility IDs per calendar year:")
@@ -214,7 +267,9 @@ class Skid:
         loggers = [logging.getLogger(config.SKID_NAME), logging.getLogger("palletjack")]
         self._remove_log_file_handlers(loggers)
 
-    def _update_counties(self, gis: arcgis.gis.GIS, county_summary_df: pd.DataFrame) -> int:
+    def _update_counties(
+        self, gis: arcgis.gis.GIS, county_summary_df: pd.DataFrame, working_dir: Path | None = None
+    ) -> int:
         """Updates the live county summary data on AGOL with data from salesforce using another feature service as a geometry source.
 
         Truncates and loads after merging the updated data with the geometries. Relies on
@@ -226,6 +281,7 @@ class Skid:
         Args:
             gis (arcgis.gis.GIS): AGOL org with both the live layer and the geometry source layer
             county_summary_df (pd.DataFrame): The county summary report generated from Salesforce records
+            working_dir (Path, optional): Directory palletjack stages the upload in. Defaults to the tempdir.
 
         Returns:
             int: Number of records updated.
@@ -240,11 +296,58 @@ class Skid:
         new_data.spatial.project(4326)
         new_data.spatial.sr = {"wkid": 4326}
 
-        updater = load.ServiceUpdater(gis, config.COUNTY_LAYER_ITEMID, working_dir=self.tempdir_path)
+        updater = load.ServiceUpdater(gis, config.COUNTY_LAYER_ITEMID, working_dir=working_dir or self.tempdir_path)
         update_count = updater.truncate_and_load(new_data)
         return update_count
 
-    def _update_facilities(self, gis: arcgis.gis.GIS, facility_summary_df: pd.DataFrame) -> int:
+    def _update_materials(
+        self, gis: arcgis.gis.GIS, materials_df: pd.DataFrame, itemid: str, working_dir: Path | None = None
+    ) -> int:
+        """Updates a live materials recycled or composted dashboard table on AGOL.
+
+        Both tables share the same schema, so the report gets the same bogus geometries and percent_ field name
+        before being truncated and loaded.
+
+        Args:
+            gis (arcgis.gis.GIS): AGOL org with the live layer
+            materials_df (pd.DataFrame): The materials recycled or composted report generated from Salesforce records
+            itemid (str): Item id of the live layer, either config.MATERIALS_LAYER_ITEMID or
+                config.COMPOSTING_LAYER_ITEMID
+            working_dir (Path, optional): Directory palletjack stages the upload in. Defaults to the tempdir.
+
+        Returns:
+            int: Number of records loaded.
+        """
+
+        materials_spatial = helpers.add_bogus_geometries(materials_df)
+        materials_spatial.rename(columns={"percent": "percent_"}, inplace=True)
+
+        updater = load.ServiceUpdater(gis, itemid, working_dir=working_dir or self.tempdir_path)
+        load_count = updater.truncate_and_load(materials_spatial)
+        return load_count
+
+    def _update_statewide(
+        self, gis: arcgis.gis.GIS, statewide_metrics_df: pd.DataFrame, working_dir: Path | None = None
+    ) -> int:
+        """Updates the live statewide metrics dashboard table on AGOL.
+
+        Args:
+            gis (arcgis.gis.GIS): AGOL org with the live layer
+            statewide_metrics_df (pd.DataFrame): The statewide totals and recovery rates per year
+            working_dir (Path, optional): Directory palletjack stages the upload in. Defaults to the tempdir.
+
+        Returns:
+            int: Number of records loaded.
+        """
+
+        statewide_spatial = helpers.add_bogus_geometries(statewide_metrics_df)
+
+        updater = load.ServiceUpdater(gis, config.STATEWIDE_LAYER_ITEMID, working_dir=working_dir or self.tempdir_path)
+        return updater.truncate_and_load(statewide_spatial)
+
+    def _update_facilities(
+        self, gis: arcgis.gis.GIS, facility_summary_df: pd.DataFrame, working_dir: Path | None = None
+    ) -> int:
         """Updates the live facility data on AGOL with data from the Google sheets and Salesforce.
 
         Truncates and loads after merging the live data with the updated data. Does not (currently) add new features.
@@ -254,6 +357,7 @@ class Skid:
         Args:
             gis (arcgis.gis.GIS): AGOL org with the live layer
             facility_summary_df (pd.DataFrame): The facility summary report generated from Salesforce records
+            working_dir (Path, optional): Directory palletjack stages the upload in. Defaults to the tempdir.
 
         Returns:
             int: Number of facilities loaded.
@@ -273,24 +377,29 @@ class Skid:
             "tons_of_material_diverted_from_"
         ].astype(str)
 
-        #: Update to overwrite the name, website, phone, and accept values on the sheet from Salesforce instead
-        google_and_sf_data.set_index("id_", inplace=True)
-        google_and_sf_data.update(
-            facility_summary_df[
-                ["id_", "website", "phone_no_", "accept_material_dropped_off_by_", "facility_name"]
-            ].set_index("id_")
+        #: Update to overwrite the name, website, phone, and accept values on the sheet from Salesforce instead. Like
+        #: DataFrame.update, only non-null Salesforce values overwrite the sheet's values.
+        salesforce_info_columns = ["website", "phone_no_", "accept_material_dropped_off_by_", "facility_name"]
+        salesforce_info = (
+            facility_summary_df.set_index("id_")[salesforce_info_columns].reindex(google_and_sf_data["id_"]).to_numpy()
         )
-        google_and_sf_data.reset_index(inplace=True)
-
-        #: Subset down the columns to only the ones that are in the live data
-        live_facility_data = transform.FeatureServiceMerging.get_live_dataframe(gis, config.FACILITIES_LAYER_ITEMID)
-        live_fields = live_facility_data.columns
+        for i, column in enumerate(salesforce_info_columns):
+            if column not in google_and_sf_data.columns:
+                continue
+            has_value = pd.notna(salesforce_info[:, i])
+            google_and_sf_data.loc[has_value, column] = salesforce_info[has_value, i]
+
+        #: Subset down the columns to only the ones that are in the live data. We only need the layer's schema, so get
+        #: the field names from its properties instead of downloading every feature.
+        facilities_layer = arcgis.features.FeatureLayer.fromitem(gis.content.get(config.FACILITIES_LAYER_ITEMID))
+        live_fields = [field["name"] for field in facilities_layer.properties.fields]
+        live_fields.append("SHAPE")  #: Geometry isn't listed as a field but is a column in the live dataframe
         common_fields = set(google_and_sf_data.columns).intersection(live_fields)
         google_and_sf_data = google_and_sf_data[list(common_fields)]
 
         #: Calculate the filter field so that MRFs are under Recycling Facilities
-        google_and_sf_data["type_filter"] = google_and_sf_data["facility_type"].apply(
-            lambda x: "Recycling Facility" if x == "Recycling Facility - MRF" else x
+        google_and_sf_data["type_filter"] = google_and_sf_data["facility_type"].replace(
+            {"Recycling Facility - MRF": "Recycling Facility"}
         )
 
         #:  Truncate and load to AGOL
@@ -298,8 +407,9 @@ class Skid:
         google_and_sf_data.spatial.project(4326)
         google_and_sf_data.spatial.set_geometry("SHAPE")
         google_and_sf_data.spatial.sr = {"wkid": 4326}
-        google_and_sf_data["last_updated"] = date.today()
-        google_and_sf_data = transform.DataCleaning.switch_to_datetime(google_and_sf_data, ["last_updated"])
+        #: Every row gets the same date, so broadcast a single ns timestamp (the dtype switch_to_datetime would produce)
+        #: instead of parsing a column of dates
+        google_and_sf_data["last_updated"] = pd.Timestamp(date.today()).as_unit("ns")
         google_and_sf_data = transform.DataCleaning.switch_to_float(
             google_and_sf_data,
             [
@@ -312,7 +422,7 @@ class Skid:
         )
 
         self.skid_logger.info("Truncating and loading...")
-        updater = load.ServiceUpdater(gis, config.FACILITIES_LAYER_ITEMID, working_dir=self.tempdir_path)
+        updater = load.ServiceUpdater(gis, config.FACILITIES_LAYER_ITEMID, working_dir=working_dir or self.tempdir_path)
         load_count = updater.truncate_and_load(google_and_sf_data)
         return load_count
 
@@ -344,19 +454,12 @@ class Skid:
             },
             inplace=True,
         )
-        combined_df = pd.concat([sw_df, uocc_df]).query('Status in ["Open", "OPEN"]')
-
-        renamed_df = (
-            transform.DataCleaning.rename_dataframe_columns_for_agol(combined_df)
-            .rename(columns=str.lower)
-            .rename(
-                columns={
-                    "longitude_": "longitude",
-                    "accept_material_dropped_off_by_the_public": "accept_material_dropped_off_by_",
-                    "tons_of_material_diverted_from_landfills_last_year": "tons_of_material_diverted_from_",
-                    "gallons_of_used_oil_collected_for_recycling_last_year": "gallons_of_used_oil_collected_f",
-                }
-            )
+        combined_df = pd.concat([sw_df, uocc_df])
+        combined_df = combined_df[combined_df["Status"].isin(["Open", "OPEN"])]
+
+        #: Lowercase and shorten the AGOL-safe names to match the live layer in a single rename
+        renamed_df = transform.DataCleaning.rename_dataframe_columns_for_agol(combined_df).rename(
+            columns=lambda name: _LIVE_FACILITY_FIELD_NAMES.get(name.lower(), name.lower())
         )
         renamed_df["id_"] = renamed_df["id_"].astype(str)
 
@@ -385,9 +488,18 @@ class Skid:
         counties_df.spatial.sr = {"wkid": 26912}
 
         #: Convert dataframe to spatial
+        #: Parse lat/long once and keep the numeric values so from_xy doesn't get strings, then drop empty,
+        #: non-numeric, and 0 lat/long
+        input_df = input_df.assign(
+            latitude=pd.to_numeric(input_df["latitude"], errors="coerce"),
+            longitude=pd.to_numeric(input_df["longitude"], errors="coerce"),
+        )
         input_df = input_df[
-            input_df["latitude"].astype(bool) & input_df["longitude"].astype(bool)
-        ]  #: Drop empty lat/long
+            input_df["latitude"].notna()
+            & input_df["longitude"].notna()
+            & (input_df["latitude"] != 0)
+            & (input_df["longitude"] != 0)
+        ]
         spatial_df = pd.DataFrame.spatial.from_xy(input_df, x_column="longitude", y_column="latitude")
         spatial_df.reset_index(drop=True, inplace=True)
         spatial_df.spatial.project(26912)
@@ -506,10 +618,11 @@ def subscribe(cloud_event: CloudEvent) -> None:
     #: CloudEvent object as the only argument.
 
     #: Use the message-body value from the pub/sub event to figure out which process to run.
-    if base64.b64decode(cloud_event.data["message"]["data"]).decode() == "facility updates":
+    message = base64.b64decode(cloud_event.data["message"]["data"]).decode()
+    if message == "facility updates":
         wmrc_skid = Skid()
         wmrc_skid.process()
-    if base64.b64decode(cloud_event.data["message"]["data"]).decode() == "validate":
+    elif message == "validate":
         run_validation()
 
 
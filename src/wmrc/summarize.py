@@ -27,8 +27,8 @@ def counties(records: helpers.SalesForceRecords) -> pd.DataFrame:
     )
     county_df.index.names = ["data_year", "name"]
     county_df.reset_index(level="data_year", inplace=True)
-    county_df.rename(index={name: name.replace("__c", "").replace("_", " ") for name in county_df.index}, inplace=True)
-    county_df["data_year"] = county_df["data_year"].apply(helpers.convert_to_int)
+    county_df.index = county_df.index.str.replace("__c", "").str.replace("_", " ")
+    county_df["data_year"] = helpers.convert_series_to_int(county_df["data_year"])
     county_df.fillna(0, inplace=True)
 
     return county_df
@@ -53,7 +53,7 @@ def facilities(records: helpers.SalesForceRecords) -> pd.DataFrame:
     )
     facility_summaries.index.name = "data_year"
     facility_summaries.reset_index(inplace=True)
-    facility_summaries["data_year"] = facility_summaries["data_year"].apply(helpers.convert_to_int)
+    facility_summaries["data_year"] = helpers.convert_series_to_int(facility_summaries["data_year"])
     facility_summaries = _add_facility_info(facility_summaries, records)
 
     return facility_summaries
@@ -80,7 +80,7 @@ def _add_facility_info(facility_df: pd.DataFrame, records: helpers.SalesForceRec
         ]
     ]
 
-    latest_records["id_"] = latest_records["facility_id"].astype(str).str[3:].str.lstrip("0")
+    latest_records["id_"] = helpers.facility_id_number(latest_records["facility_id"])
     latest_records.drop(columns="facility_id", inplace=True)
     latest_records.rename(
         columns={
@@ -142,7 +142,7 @@ def materials_recycled(records: helpers.SalesForceRecords) -> pd.DataFrame:
         .reset_index()
         .rename(columns={"Calendar_Year__c": "year_"})
     )
-    materials_recycled["year_"] = materials_recycled["year_"].apply(helpers.convert_to_int)
+    materials_recycled["year_"] = helpers.convert_series_to_int(materials_recycled["year_"])
 
     return materials_recycled
 
@@ -159,7 +159,6 @@ def materials_composted(records: helpers.SalesForceRecords) -> pd.DataFrame:
     """
 
     composting_fields = [
-        "Municipal Solid Waste",
         "Total Material Received Compost",
         "Total Paper and Paperboard receiced (C)",
         "Total Plastic Materials received (C)",
@@ -187,7 +186,7 @@ def materials_composted(records: helpers.SalesForceRecords) -> pd.DataFrame:
         .reset_index()
         .rename(columns={"Calendar_Year__c": "year_"})
     )
-    materials_composted["year_"] = materials_composted["year_"].apply(helpers.convert_to_int)
+    materials_composted["year_"] = helpers.convert_series_to_int(materials_composted["year_"])
     materials_composted["material"] = materials_composted["material"].replace(
         {"BFS": "Biosolids, Food Processing Residuals, and Sewage Sludge"}
     )
@@ -210,34 +209,35 @@ def recovery_rates_by_tonnage(records: helpers.SalesForceRecords) -> pd.Series:
         pd.Series: recovery rates per year with index name data_year and series name
             "annual_recycling_uncontaminated_rate"
     """
-    #: Create our various modifiers
-    records.df["in_state_modifier"] = (100 - records.df["Out_of_State__c"]) / 100
-    records.df["msw_modifier"] = records.df["Municipal_Solid_Waste__c"] / 100
-    records.df["recovery_rate"] = (100 - records.df["Annual_Recycling_Contamination_Rate__c"]) / 100
+    #: Create our various modifiers. These are only needed here, so keep them local instead of adding columns to
+    #: records.df.
+    in_state_modifier = (100 - records.df["Out_of_State__c"]) / 100
+    msw_modifier = records.df["Municipal_Solid_Waste__c"] / 100
+    recovery_rate = (100 - records.df["Annual_Recycling_Contamination_Rate__c"]) / 100
 
     #: Amount of material recycled
-    records.df["in_state_msw_recycled"] = (
-        records.df["Combined_Total_of_Material_Recycled__c"]
-        * records.df["in_state_modifier"]
-        * records.df["msw_modifier"]
-    )
+    in_state_msw_recycled = records.df["Combined_Total_of_Material_Recycled__c"] * in_state_modifier * msw_modifier
 
     #: Amount of material received derived from recovery rate
-    records.df["in_state_msw_received_for_recycling"] = (
-        records.df["in_state_msw_recycled"] / records.df["recovery_rate"]
-    )
-
-    #: Uncontaminated rates by year
-    clean_rates = records.df.groupby("Calendar_Year__c").apply(
-        lambda year_df: (
-            year_df["in_state_msw_recycled"].sum() / year_df["in_state_msw_received_for_recycling"].sum() * 100
+    in_state_msw_received_for_recycling = in_state_msw_recycled / recovery_rate
+
+    #: Uncontaminated rates by year: sum both values per year in one groupby, then divide the yearly totals
+    yearly_totals = (
+        pd.DataFrame(
+            {
+                "in_state_msw_recycled": in_state_msw_recycled,
+                "in_state_msw_received_for_recycling": in_state_msw_received_for_recycling,
+            }
         )
+        .groupby(records.df["Calendar_Year__c"])
+        .sum()
     )
+    clean_rates = yearly_totals["in_state_msw_recycled"] / yearly_totals["in_state_msw_received_for_recycling"] * 100
 
     clean_rates.replace([np.inf, -np.inf], np.nan, inplace=True)  #: Can arise from division by np.nan
     clean_rates.name = "annual_recycling_uncontaminated_rate"
     clean_rates.index.name = "data_year"
-    clean_rates.index = clean_rates.index.map(helpers.convert_to_int)
+    clean_rates.index = helpers.convert_series_to_int(clean_rates.index)
 
     return clean_rates
 
@@ -261,6 +261,6 @@ def facility_metrics(records: helpers.SalesForceRecords) -> pd.DataFrame:
     )
     facility_metrics.index.name = "data_year"
     facility_metrics.reset_index(inplace=True)
-    facility_metrics["data_year"] = facility_metrics["data_year"].apply(helpers.convert_to_int)
+    facility_metrics["data_year"] = helpers.convert_series_to_int(facility_metrics["data_year"])
 
     return facility_metrics
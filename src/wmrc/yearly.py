@@ -5,6 +5,14 @@ import re
 import numpy as np
 import pandas as pd
 
+try:
+    from wmrc import helpers
+except ImportError:
+    import helpers
+
+#: Pulls the material name out of a material total field name (Total_Paper_Materials_recycled__c -> Paper_Materials)
+_MATERIAL_NAME_REGEX = re.compile(r"(?<=Total_)(.+)(?=_recei|_recycled|Materials_recycled)")
+
 
 def county_summaries(year_df: pd.DataFrame, county_fields: list[str]) -> pd.DataFrame:
     """Calculate the county-wide summaries for Municipal Solid Waste (MSW) over time.
@@ -29,34 +37,37 @@ def county_summaries(year_df: pd.DataFrame, county_fields: list[str]) -> pd.Data
             overall recycling rate
     """
 
-    #: Create new dataframes that have a column for each county, one dataframe per category
-    recycling_df = pd.DataFrame()
-    composted_df = pd.DataFrame()
-    digested_df = pd.DataFrame()
-    landfilled_df = pd.DataFrame()
+    #: County percentages as fractions, one column per county (NaNs become 0 so they don't add anything to the sums)
+    county_shares = year_df[county_fields].to_numpy(dtype=np.float64, na_value=0) / 100
 
     #: MSW modifier is the percentage of the facility's materials that are MSW instead of construction debris, etc.
-    year_df["msw_modifier"] = year_df["Municipal_Solid_Waste__c"] / 100
-
-    #: Calculate the tons per county for each category
-    for county in county_fields:
-        recycling_df[county] = (
-            year_df[county] / 100 * year_df["msw_modifier"] * year_df["Combined_Total_of_Material_Recycled__c"]
-        )
-        composted_df[county] = (
-            year_df[county] / 100 * year_df["msw_modifier"] * year_df["Total_Materials_sent_to_composting__c"]
-        )
-        digested_df[county] = (
-            year_df[county] / 100 * year_df["msw_modifier"] * year_df["Total_Material_managed_by_ADC__c"]
-        )
-        landfilled_df[county] = year_df[county] / 100 * year_df["Municipal_Waste_In_State_in_Tons__c"]
-
-    #: Now sum all the counties to get a single value per county per category
-    counties_df = pd.DataFrame()
-    counties_df["county_wide_msw_recycled"] = recycling_df.sum()
-    counties_df["county_wide_msw_composted"] = composted_df.sum()
-    counties_df["county_wide_msw_digested"] = digested_df.sum()
-    counties_df["county_wide_msw_landfilled"] = landfilled_df.sum()
+    msw_modifier = year_df["Municipal_Solid_Waste__c"].to_numpy(dtype=np.float64, na_value=0) / 100
+
+    materials = year_df[
+        [
+            "Combined_Total_of_Material_Recycled__c",
+            "Total_Materials_sent_to_composting__c",
+            "Total_Material_managed_by_ADC__c",
+            "Municipal_Waste_In_State_in_Tons__c",
+        ]
+    ].to_numpy(dtype=np.float64, na_value=0)
+
+    #: Sum each county's share of each category across all the records with a single matrix product per group:
+    #: (counties x records) @ (records x categories) -> (counties x categories)
+    msw_tons = (county_shares * msw_modifier[:, np.newaxis]).T @ materials[:, :3]
+    landfilled_tons = county_shares.T @ materials[:, 3]
+
+    counties_df = pd.DataFrame(
+        np.column_stack([msw_tons, landfilled_tons]),
+        index=county_fields,
+        columns=[
+            "county_wide_msw_recycled",
+            "county_wide_msw_composted",
+            "county_wide_msw_digested",
+            "county_wide_msw_landfilled",
+        ],
+    )
+
     statewide = counties_df.sum()
     statewide.name = "Statewide"
     counties_df = pd.concat([counties_df, pd.DataFrame(statewide).T], axis=0)
@@ -91,9 +102,7 @@ def facility_tons_diverted_from_landfills(year_df: pd.DataFrame) -> pd.DataFrame
         pd.DataFrame: Facility name, id, and total tons diverted from landfills
     """
 
-    fields = [
-        "Facility_Name__c",
-        "facility_id",
+    diverted_fields = [
         "Combined_Total_of_Material_Recycled__c",
         "Total_Materials_recycled__c",
         "Total_Materials_sent_to_composting__c",
@@ -104,29 +113,23 @@ def facility_tons_diverted_from_landfills(year_df: pd.DataFrame) -> pd.DataFrame
         "Total_waste_tires_recycled_in_Tons__c",
         "Total_WT_for_combustion_in_Tons__c",
     ]
-    subset_df = year_df[fields].copy()
+    subset_df = year_df[["Facility_Name__c", "facility_id", *diverted_fields]]
 
-    #: Sum any duplicate records for a single facility
+    #: Sum any duplicate records for a single facility. Groups are left in the order they appear; downstream joins
+    #: are all on id_ so the row order doesn't matter.
     #: NOTE: May be necessary now that records are deduplicated, leave for now
-    sum_df = subset_df.groupby(["Facility_Name__c", "facility_id"]).sum().reset_index()
-
-    sum_df["tons_of_material_diverted_from_"] = (
-        sum_df["Combined_Total_of_Material_Recycled__c"]
-        + sum_df["Total_Materials_recycled__c"]
-        + sum_df["Total_Materials_sent_to_composting__c"]
-        + sum_df["Combined_Total_Material_for_Compostion__c"]
-        + sum_df["Total_Material_managed_by_ADC__c"]
-        + sum_df["Combined_Total_Material_for_Combustion__c"]
-        + sum_df["Total_Materials_combusted__c"]
-        + sum_df["Total_waste_tires_recycled_in_Tons__c"]
-        + sum_df["Total_WT_for_combustion_in_Tons__c"]
-    )
+    sum_df = subset_df.groupby(["Facility_Name__c", "facility_id"], sort=False, observed=True, as_index=False)[
+        diverted_fields
+    ].sum()
+
+    #: groupby's sum has already turned any NaNs into 0s, so a single row-wise sum matches adding the columns together
+    sum_df["tons_of_material_diverted_from_"] = sum_df[diverted_fields].to_numpy().sum(axis=1)
 
     #: Include recycling facility recycling totals
     sum_df["tons_recycled_at_recycle_fac"] = sum_df["Combined_Total_of_Material_Recycled__c"]
 
     #: Extract just the number part of the facility id, strip leading zeros
-    sum_df["id_"] = sum_df["facility_id"].astype(str).str[3:].str.lstrip("0")
+    sum_df["id_"] = helpers.facility_id_number(sum_df["facility_id"])
 
     #: Replace 0s with NaN for AGOL/Arcade logic (want to identify missing data as such, not as 0s)
     sum_df["tons_of_material_diverted_from_"] = sum_df["tons_of_material_diverted_from_"].replace(0, np.nan)
@@ -142,36 +145,40 @@ def rates_per_material(year_df: pd.DataFrame, classification: str, fields: list[
         year_df (pd.DataFrame): Dataframe of facility records for a single year (can be .applied to a groupby(year)
             object).
         classification (str): Report Classification, either "Recycling" or "Composts"
-        fields (list[str]): List of the fields containing the material totals.
+        fields (list[str]): List of the fields containing the material totals. Must not include the out-of-state or
+            MSW modifier fields, which are always used.
         total_field (str): The field containing the total material received for the percentage calculation.
 
+    Raises:
+        ValueError: If fields includes either of the modifier fields
+
     Returns:
         pd.DataFrame: Renamed material types, total tonnage processed, and percent processed
     """
 
-    #: Make sure the out-of-state and MSW modifier fields are the last two fields
-    needed_fields = _update_fields(fields)
+    modifier_fields = ["Out_of_State__c", "Municipal_Solid_Waste__c"]
+    if any(field in modifier_fields for field in fields):
+        raise ValueError(f"Material fields should not include the modifier fields {modifier_fields}")
 
     #: Update: Recycling should also include "Recycling Facility Non-Permitted"
     classification = _update_classification(classification)
 
-    subset_df = year_df[year_df["Classifications__c"].isin(classification)][needed_fields]
+    subset_df = year_df.loc[year_df["Classifications__c"].isin(classification), [*fields, *modifier_fields]]
 
-    #: Sum totals across all records taking into account MSW and out-of-state modifiers, calculate total percentage
-    sum_series = pd.Series()
-    for col in needed_fields[:-2]:  #: We don't want sum to include raw MSW or out-of-state modifier values
-        sum_series[col] = (
-            (100 - subset_df["Out_of_State__c"]) / 100 * subset_df["Municipal_Solid_Waste__c"] / 100 * subset_df[col]
-        ).sum()
-    sum_df = pd.DataFrame(sum_series, columns=["amount"])
+    #: Sum totals across all records taking into account MSW and out-of-state modifiers, calculate total percentage.
+    #: The weighted column sums are a single vector-matrix product: (records) @ (records x materials) -> (materials)
+    modifiers = (100 - subset_df["Out_of_State__c"]) / 100 * subset_df["Municipal_Solid_Waste__c"] / 100
+    modifiers = modifiers.to_numpy(dtype=np.float64, na_value=0)
+    materials = subset_df[fields].to_numpy(dtype=np.float64, na_value=0)
+    sum_df = pd.DataFrame({"amount": modifiers @ materials}, index=fields)
     sum_df["percent"] = sum_df["amount"] / sum_df.loc[total_field, "amount"]
 
     #: Rename columns for existing AGOL layer
-    regex = re.compile(r"(?<=Total_)(.+)((?=_recei)|((?=_recycled)|(?=Materials_recycled)))")
     sum_df.reset_index(names="material", inplace=True)
     sum_df["material"] = (
         sum_df["material"]
-        .apply(lambda x: re.search(regex, x)[0] if re.search(regex, x) else x)
+        .str.extract(_MATERIAL_NAME_REGEX, expand=False)
+        .fillna(sum_df["material"])  #: Keep the field name as-is if it doesn't match
         .str.removesuffix("_Materials")
         .str.replace("__c", "")
         .str.replace("_", " ")
@@ -183,23 +190,6 @@ def rates_per_material(year_df: pd.DataFrame, classification: str, fields: list[
     return sum_df
 
 
-def _update_fields(fields: list[str]) -> list[str]:
-    """Ensures that the Out of state percentage and Municipal Solid Waste fields are the last two fields in the list."""
-    try:
-        fields.remove("Out_of_State__c")
-    except ValueError:
-        pass
-    fields.append("Out_of_State__c")
-
-    try:
-        fields.remove("Municipal_Solid_Waste__c")
-    except ValueError:
-        pass
-    fields.append("Municipal_Solid_Waste__c")
-
-    return fields
-
-
 def _update_classification(classification: str) -> list[str]:
     """Make classification a list, ensure recycling includes non-permitted facilities."""
     if classification == "Recycling":
@@ -223,20 +213,30 @@ def statewide_metrics(county_year_df: pd.DataFrame) -> pd.DataFrame:
 
     in_state_only = county_year_df.drop(index=["Out of State", "Statewide"], errors="ignore")
 
-    statewide_series = pd.Series()
-    statewide_series["statewide_msw_recycled"] = in_state_only["county_wide_msw_recycled"].sum()
-    statewide_series["statewide_msw_composted"] = in_state_only["county_wide_msw_composted"].sum()
-    statewide_series["statewide_msw_digested"] = in_state_only["county_wide_msw_digested"].sum()
-    statewide_series["statewide_msw_landfilled"] = in_state_only["county_wide_msw_landfilled"].sum()
-    statewide_series["statewide_msw_diverted_total"] = (
-        statewide_series["statewide_msw_recycled"]
-        + statewide_series["statewide_msw_composted"]
-        + statewide_series["statewide_msw_digested"]
+    #: Sum all four categories in one pass and build the series once instead of growing it a key at a time
+    recycled, composted, digested, landfilled = (
+        in_state_only[
+            [
+                "county_wide_msw_recycled",
+                "county_wide_msw_composted",
+                "county_wide_msw_digested",
+                "county_wide_msw_landfilled",
+            ]
+        ]
+        .sum()
+        .to_numpy()
     )
-    statewide_series["statewide_msw_recycling_rate"] = (
-        statewide_series["statewide_msw_diverted_total"]
-        / (statewide_series["statewide_msw_diverted_total"] + statewide_series["statewide_msw_landfilled"])
-        * 100
+    diverted_total = recycled + composted + digested
+
+    statewide_series = pd.Series(
+        {
+            "statewide_msw_recycled": recycled,
+            "statewide_msw_composted": composted,
+            "statewide_msw_digested": digested,
+            "statewide_msw_landfilled": landfilled,
+            "statewide_msw_diverted_total": diverted_total,
+            "statewide_msw_recycling_rate": diverted_total / (diverted_total + landfilled) * 100,
+        }
     )
 
     return statewide_series
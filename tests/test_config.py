@@ -0,0 +1,115 @@
+import logging
+import urllib.error
+
+import pytest
+from wmrc import config
+
+
+class TestResolveHostName:
+
+    def test_resolve_host_name_returns_fresh_cache_without_refreshing(self, mocker, tmp_path):
+        cache = tmp_path / "project-id"
+        cache.write_text("cached-project", encoding="utf-8")
+        mocker.patch.object(config, "PROJECT_ID_CACHE", cache)
+        urlopen_mock = mocker.patch.object(config.urllib.request, "urlopen")
+        thread_mock = mocker.patch.object(config.threading, "Thread")
+
+        assert config._resolve_host_name() == "cached-project"
+
+        urlopen_mock.assert_not_called()
+        thread_mock.assert_not_called()
+
+    def test_resolve_host_name_returns_stale_cache_and_refreshes_in_background(self, mocker, tmp_path):
+        cache = tmp_path / "project-id"
+        cache.write_text("cached-project", encoding="utf-8")
+        mocker.patch.object(config, "PROJECT_ID_CACHE", cache)
+        mocker.patch.object(config, "PROJECT_ID_CACHE_MAX_AGE", -1)
+        urlopen_mock = mocker.patch.object(config.urllib.request, "urlopen")
+        thread_mock = mocker.patch.object(config.threading, "Thread")
+
+        assert config._resolve_host_name() == "cached-project"
+
+        urlopen_mock.assert_not_called()
+        thread_mock.assert_called_once_with(target=config._refresh_project_id, daemon=True)
+        thread_mock.return_value.start.assert_called_once()
+
+    def test_resolve_host_name_falls_back_to_hostname_when_metadata_fails(self, mocker, tmp_path):
+        mocker.patch.object(config, "PROJECT_ID_CACHE", tmp_path / "project-id")
+        mocker.patch.object(config.urllib.request, "urlopen", side_effect=urllib.error.URLError("timed out"))
+        mocker.patch.object(config.socket, "gethostname", return_value="local-host")
+        thread_mock = mocker.patch.object(config.threading, "Thread")
+
+        assert config._resolve_host_name() == "local-host"
+
+        thread_mock.assert_called_once_with(target=config._refresh_project_id, daemon=True)
+        thread_mock.return_value.start.assert_called_once()
+
+    def test_resolve_host_name_fetches_and_caches_without_cache(self, mocker, tmp_path):
+        cache = tmp_path / "project-id"
+        mocker.patch.object(config, "PROJECT_ID_CACHE", cache)
+        urlopen_mock = mocker.patch.object(config.urllib.request, "urlopen")
+        urlopen_mock.return_value.read.return_value = b"metadata-project"
+        thread_mock = mocker.patch.object(config.threading, "Thread")
+
+        assert config._resolve_host_name() == "metadata-project"
+
+        assert cache.read_text(encoding="utf-8") == "metadata-project"
+        assert list(tmp_path.iterdir()) == [cache]
+        thread_mock.assert_not_called()
+
+
+class TestFetchProjectId:
+
+    def test_fetch_project_id_raises_on_empty_project_id(self, mocker, tmp_path):
+        cache = tmp_path / "project-id"
+        mocker.patch.object(config, "PROJECT_ID_CACHE", cache)
+        urlopen_mock = mocker.patch.object(config.urllib.request, "urlopen")
+        urlopen_mock.return_value.read.return_value = b""
+
+        with pytest.raises(ValueError, match="Empty project id"):
+            config._fetch_project_id()
+
+        assert not cache.exists()
+
+    def test_fetch_project_id_returns_id_and_cleans_up_when_caching_fails(self, mocker, tmp_path):
+        mocker.patch.object(config, "PROJECT_ID_CACHE", tmp_path / "project-id")
+        urlopen_mock = mocker.patch.object(config.urllib.request, "urlopen")
+        urlopen_mock.return_value.read.return_value = b"metadata-project"
+        mocker.patch.object(config.os, "replace", side_effect=OSError("read-only"))
+
+        assert config._fetch_project_id() == "metadata-project"
+
+        assert list(tmp_path.iterdir()) == []
+
+    def test_refresh_project_id_logs_failures(self, mocker, caplog):
+        mocker.patch.object(config, "_fetch_project_id", side_effect=urllib.error.URLError("timed out"))
+
+        with caplog.at_level(logging.DEBUG, logger=config.SKID_NAME):
+            config._refresh_project_id()
+
+        assert "Could not refresh the cached project id" in caplog.text
+
+
+class TestModuleGetattr:
+
+    def test_host_name_is_resolved_once_and_stored(self, mocker):
+        mocker.patch.dict(config.__dict__)
+        config.__dict__.pop("HOST_NAME", None)
+        resolve_mock = mocker.patch.object(config, "_resolve_host_name", return_value="project")
+
+        assert config.HOST_NAME == "project"
+        assert config.HOST_NAME == "project"
+
+        resolve_mock.assert_called_once()
+
+    def test_sendgrid_settings_prefix_uses_host_name(self, mocker):
+        mocker.patch.dict(config.__dict__)
+        config.__dict__.pop("HOST_NAME", None)
+        config.__dict__.pop("SENDGRID_SETTINGS", None)
+        mocker.patch.object(config, "_resolve_host_name", return_value="project")
+
+        assert config.SENDGRID_SETTINGS["prefix"] == "wmrc on project: "
+
+    def test_unknown_attribute_raises(self):
+        with pytest.raises(AttributeError, match="has no attribute 'FOO'"):
+            config.FOO
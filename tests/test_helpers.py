@@ -1,4 +1,7 @@
+import json
+
 import pandas as pd
+import pytest
 from wmrc import helpers
 
 
@@ -16,6 +19,35 @@ class TestSmallMethods:
 
         assert result_df.spatial.validate()
 
+    def test_convert_to_int_handles_digits_and_bad_values(self):
+        assert helpers.convert_to_int("2022") == 2022
+        assert helpers.convert_to_int("-1") == -1
+        assert helpers.convert_to_int(" 2023 ") == 2023
+        assert helpers.convert_to_int("foo") == -1
+        assert helpers.convert_to_int(2024.0) == 2024
+        assert helpers.convert_to_int("--5") == -1
+        assert helpers.convert_to_int("\u00b2") == -1
+
+    def test_convert_series_to_int_uses_negative_one_for_bad_values(self):
+        result = helpers.convert_series_to_int(pd.Series(["2022", "foo", None, "2023"]))
+
+        pd.testing.assert_series_equal(result, pd.Series([2022, -1, -1, 2023]))
+
+    def test_convert_series_to_int_handles_float_strings(self):
+        result = helpers.convert_series_to_int(pd.Series(["2022.0", "2022.5", "2e3", "inf", 2023.0]))
+
+        pd.testing.assert_series_equal(result, pd.Series([2022, -1, 2000, -1, 2023]))
+
+    def test_convert_series_to_int_handles_index(self):
+        result = helpers.convert_series_to_int(pd.Index(["2022", "2022.5", "foo"], name="data_year"))
+
+        pd.testing.assert_index_equal(result, pd.Index([2022, -1, -1], name="data_year"))
+
+    def test_facility_id_number_strips_prefix_and_leading_zeros(self):
+        result = helpers.facility_id_number(pd.Series(["SWF0123", "SWF1000", "SW", 456]))
+
+        pd.testing.assert_series_equal(result, pd.Series(["123", "1000", "", ""]))
+
 
 class TestSalesForceRecords:
 
@@ -35,6 +67,177 @@ class TestSalesForceRecords:
             == "b,d,RecordTypeId,Classifications__c,RecordType.Name,Facility__r.Solid_Waste_Facility_ID_Number__c,LastModifiedDate,Are_materials_accepted_for_drop_off__c,Facility_Phone_Number__c,Facility_Website__c,foo,bar"
         )
 
+    def test_build_columns_string_drops_duplicate_fields(self, mocker):
+        salesforce_records = mocker.Mock()
+
+        salesforce_records.field_mapping = {
+            "a": "b",
+            "Classification": "Classifications__c",
+        }
+        salesforce_records.county_fields = ["foo", "b"]
+
+        result = helpers.SalesForceRecords._build_columns_string(salesforce_records)
+
+        assert result.split(",").count("Classifications__c") == 1
+        assert result.split(",").count("b") == 1
+        assert result.startswith("b,Classifications__c,RecordTypeId,")
+        assert result.endswith(",foo")
+
+    def test_extract_data_from_salesforce_pulls_facility_id_from_nested_object(self, mocker):
+        salesforce_records = mocker.Mock()
+        salesforce_records._build_columns_string.return_value = "foo"
+        salesforce_records._get_records.return_value = pd.DataFrame(
+            {
+                "a": [1, 2],
+                "Classifications__c": ["Recycling", "Composts"],
+                "Facility__r": [
+                    {"Solid_Waste_Facility_ID_Number__c": "SW0101"},
+                    {"Solid_Waste_Facility_ID_Number__c": "SW0202"},
+                ],
+            }
+        )
+
+        helpers.SalesForceRecords.extract_data_from_salesforce(salesforce_records)
+
+        assert salesforce_records.df["facility_id"].tolist() == ["SW0101", "SW0202"]
+
+    def test_extract_data_from_salesforce_handles_missing_facility(self, mocker):
+        salesforce_records = mocker.Mock()
+        salesforce_records._build_columns_string.return_value = "foo"
+        salesforce_records._get_records.return_value = pd.DataFrame(
+            {
+                "a": [1, 2],
+                "Classifications__c": ["Recycling", "Composts"],
+                "Facility__r": [{"Solid_Waste_Facility_ID_Number__c": "SW0101"}, None],
+            }
+        )
+
+        helpers.SalesForceRecords.extract_data_from_salesforce(salesforce_records)
+
+        assert salesforce_records.df["facility_id"].tolist() == ["SW0101", None]
+
+    def test_extract_data_from_salesforce_stores_classifications_as_categorical(self, mocker):
+        salesforce_records = mocker.Mock()
+        salesforce_records._build_columns_string.return_value = "foo"
+        salesforce_records._get_records.return_value = pd.DataFrame(
+            {
+                "Classifications__c": ["Recycling", "Composts", "Recycling", None],
+                "Facility__r": [None, None, None, None],
+            }
+        )
+
+        helpers.SalesForceRecords.extract_data_from_salesforce(salesforce_records)
+
+        assert isinstance(salesforce_records.df["Classifications__c"].dtype, pd.CategoricalDtype)
+        assert salesforce_records.df["Classifications__c"].tolist()[:3] == ["Recycling", "Composts", "Recycling"]
+
+    def test_get_records_follows_next_records_url(self, mocker):
+        salesforce_records = mocker.Mock()
+        salesforce_records.salesforce_extractor._query_records.side_effect = [
+            {"done": False, "nextRecordsUrl": "/next/1", "records": [{"a": 1}, {"a": 2}]},
+            {"done": False, "nextRecordsUrl": "/next/2", "records": [{"a": 3}]},
+            {"done": True, "records": [{"a": 4}]},
+        ]
+
+        result = helpers.SalesForceRecords._get_records(salesforce_records, "SELECT a FROM foo")
+
+        pd.testing.assert_frame_equal(result, pd.DataFrame({"a": [1, 2, 3, 4]}))
+        assert salesforce_records.salesforce_extractor._query_records.call_args_list == [
+            mocker.call("services/data/v60.0/query/", {"q": "SELECT a FROM foo"}),
+            mocker.call("/next/1"),
+            mocker.call("/next/2"),
+        ]
+
+    def test_get_salesforce_columns_uses_describe_field_names(self, mocker, tmp_path):
+        mocker.patch.object(helpers.config, "SALESFORCE_COLUMNS_CACHE", tmp_path / "columns.json")
+        salesforce_records = mocker.Mock()
+        salesforce_records.salesforce_extractor.org_url = "https://org.my.salesforce.com"
+        salesforce_records.salesforce_extractor._query_records.return_value = {
+            "name": "Application_Report__c",
+            "fields": [{"name": "Id", "type": "id"}, {"name": "Cache_County__c", "type": "percent"}],
+        }
+
+        result = helpers.SalesForceRecords._get_salesforce_columns(salesforce_records)
+
+        assert result == ["Id", "Cache_County__c"]
+        salesforce_records.salesforce_extractor._query_records.assert_called_once_with(
+            "services/data/v60.0/sobjects/Application_Report__c/describe/"
+        )
+
+    def test_get_salesforce_columns_writes_and_reads_cache(self, mocker, tmp_path):
+        mocker.patch.object(helpers.config, "SALESFORCE_COLUMNS_CACHE", tmp_path / "columns.json")
+        salesforce_records = mocker.Mock()
+        salesforce_records.salesforce_extractor.org_url = "https://org.my.salesforce.com"
+        salesforce_records.salesforce_extractor._query_records.return_value = {"fields": [{"name": "Id"}]}
+
+        first = helpers.SalesForceRecords._get_salesforce_columns(salesforce_records)
+        second = helpers.SalesForceRecords._get_salesforce_columns(salesforce_records)
+
+        assert first == second == ["Id"]
+        assert (tmp_path / "columns.json").exists()
+        salesforce_records.salesforce_extractor._query_records.assert_called_once()
+
+    def test_get_salesforce_columns_returns_columns_and_cleans_up_when_caching_fails(self, mocker, tmp_path):
+        mocker.patch.object(helpers.config, "SALESFORCE_COLUMNS_CACHE", tmp_path / "columns.json")
+        mocker.patch.object(helpers.os, "replace", side_effect=OSError("read-only"))
+        salesforce_records = mocker.Mock()
+        salesforce_records.salesforce_extractor.org_url = "https://org.my.salesforce.com"
+        salesforce_records.salesforce_extractor._query_records.return_value = {"fields": [{"name": "Id"}]}
+
+        result = helpers.SalesForceRecords._get_salesforce_columns(salesforce_records)
+
+        assert result == ["Id"]
+        assert list(tmp_path.iterdir()) == []
+
+    def test_get_salesforce_columns_ignores_stale_cache(self, mocker, tmp_path):
+        cache = tmp_path / "columns.json"
+        cache.write_text('{"org_url": "https://org.my.salesforce.com", "columns": ["Old"]}', encoding="utf-8")
+        mocker.patch.object(helpers.config, "SALESFORCE_COLUMNS_CACHE", cache)
+        mocker.patch.object(helpers.config, "SALESFORCE_COLUMNS_CACHE_MAX_AGE", -1)
+        salesforce_records = mocker.Mock()
+        salesforce_records.salesforce_extractor.org_url = "https://org.my.salesforce.com"
+        salesforce_records.salesforce_extractor._query_records.return_value = {"fields": [{"name": "New"}]}
+
+        result = helpers.SalesForceRecords._get_salesforce_columns(salesforce_records)
+
+        assert result == ["New"]
+        assert json.loads(cache.read_text(encoding="utf-8")) == {
+            "org_url": "https://org.my.salesforce.com",
+            "columns": ["New"],
+        }
+
+    def test_get_salesforce_columns_ignores_cache_from_other_org(self, mocker, tmp_path):
+        cache = tmp_path / "columns.json"
+        cache.write_text('{"org_url": "https://sandbox.my.salesforce.com", "columns": ["Old"]}', encoding="utf-8")
+        mocker.patch.object(helpers.config, "SALESFORCE_COLUMNS_CACHE", cache)
+        salesforce_records = mocker.Mock()
+        salesforce_records.salesforce_extractor.org_url = "https://org.my.salesforce.com"
+        salesforce_records.salesforce_extractor._query_records.return_value = {"fields": [{"name": "New"}]}
+
+        result = helpers.SalesForceRecords._get_salesforce_columns(salesforce_records)
+
+        assert result == ["New"]
+
+    def test_build_field_mapping_raises_on_missing_fields(self, mocker):
+        salesforce_records = mocker.Mock()
+        salesforce_records.field_mapping = {}
+        salesforce_records._get_salesforce_columns.return_value = [
+            "Municipal_Solid_Waste__c",
+            "Municipal_Waste_In_State_in_Tons__c",
+            "Total_Material_managed_by_ADC__c",
+            "Cache_County__c",
+            "Utah_County_Tons__c",
+        ]
+
+        with pytest.raises(ValueError, match="Missing fields: \\['Combined Total of Material Recycled',"):
+            helpers.SalesForceRecords._build_field_mapping(salesforce_records)
+
+        assert salesforce_records.county_fields == ["Cache_County__c", "Utah_County_Tons__c", "Out_of_State__c"]
+        assert salesforce_records.field_mapping["Municipal Waste In-State (in Tons)"] == (
+            "Municipal_Waste_In_State_in_Tons__c"
+        )
+        assert salesforce_records.field_mapping["Total Material managed by AD/C"] == "Total_Material_managed_by_ADC__c"
+
     def test_deduplicate_records_on_facility_id_single_year(self, mocker):
         salesforce_records = mocker.Mock()
         salesforce_records.df = pd.DataFrame(
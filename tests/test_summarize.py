@@ -151,6 +151,23 @@ class TestSummaryMethods:
 
         pd.testing.assert_series_equal(output_series, test_df)
 
+    def test_recovery_rates_by_tonnage_does_not_add_columns_to_records(self, mocker):
+        records = mocker.Mock()
+        records.df = pd.DataFrame(
+            {
+                "Calendar_Year__c": [2022, 2023],
+                "Out_of_State__c": [0, 0],
+                "Municipal_Solid_Waste__c": [100, 100],
+                "Annual_Recycling_Contamination_Rate__c": [50, 50],
+                "Combined_Total_of_Material_Recycled__c": [50, 40],
+            }
+        )
+        original_columns = list(records.df.columns)
+
+        summarize.recovery_rates_by_tonnage(records)
+
+        assert list(records.df.columns) == original_columns
+
 
 class TestAddFacilityInfo:
 
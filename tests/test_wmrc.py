@@ -1,4 +1,8 @@
+import base64
+import logging
+
 import pandas as pd
+import pytest
 
 from wmrc import main
 
@@ -24,6 +28,25 @@ def test_get_secrets_from_local_location(mocker):
     assert exists_mock.call_count == 2
 
 
+def test_remove_log_file_handlers_removes_and_closes_only_the_file_handler(mocker):
+    skid_mock = mocker.Mock()
+    file_handler = mocker.Mock(spec=logging.Handler)
+    other_handler = mocker.Mock(spec=logging.Handler)
+    skid_mock.log_file_handler = file_handler
+    logger_a = logging.getLogger("wmrc_test_a")
+    logger_b = logging.getLogger("wmrc_test_b")
+    for logger in [logger_a, logger_b]:
+        logger.addHandler(other_handler)
+        logger.addHandler(file_handler)
+
+    main.Skid._remove_log_file_handlers(skid_mock, [logger_a, logger_b])
+
+    assert logger_a.handlers == [other_handler]
+    assert logger_b.handlers == [other_handler]
+    file_handler.close.assert_called_once()
+    other_handler.close.assert_not_called()
+
+
 class TestUpdateMethods:
 
     def test_update_counties_merges_data_and_shapes(self, mocker):
@@ -65,6 +88,75 @@ class TestUpdateMethods:
 
         pd.testing.assert_frame_equal(updater_mock.truncate_and_load.call_args[0][0], test_df)
 
+    def test_update_materials_renames_percent_and_loads(self, mocker):
+        mocker.patch("wmrc.main.helpers.add_bogus_geometries", side_effect=lambda df: df)
+        updater_mock = mocker.patch("wmrc.main.load.ServiceUpdater", autospec=True)
+        updater_mock.return_value.truncate_and_load.return_value = 2
+
+        materials_df = pd.DataFrame({"material": ["Paper", "Glass"], "percent": [0.6, 0.4]})
+        skid_mock = mocker.Mock()
+        gis_mock = mocker.Mock()
+
+        load_count = main.Skid._update_materials(skid_mock, gis_mock, materials_df, "itemid", "working_dir")
+
+        assert load_count == 2
+        updater_mock.assert_called_once_with(gis_mock, "itemid", working_dir="working_dir")
+        pd.testing.assert_frame_equal(
+            updater_mock.return_value.truncate_and_load.call_args[0][0],
+            pd.DataFrame({"material": ["Paper", "Glass"], "percent_": [0.6, 0.4]}),
+        )
+
+    def test_update_facilities_subsets_to_live_layer_fields_and_shape(self, mocker):
+        mocker.patch("wmrc.main.pd.DataFrame.spatial")
+        arcgis_mock = mocker.patch("wmrc.main.arcgis")
+        arcgis_mock.features.FeatureLayer.fromitem.return_value.properties.fields = [
+            {"name": "id_"},
+            {"name": "facility_type"},
+            {"name": "website"},
+            {"name": "tons_of_material_diverted_from_"},
+        ]
+        mocker.patch("wmrc.main.transform.DataCleaning.switch_to_float", side_effect=lambda df, fields: df)
+        updater_mock = mocker.patch("wmrc.main.load.ServiceUpdater", autospec=True)
+
+        skid_mock = mocker.Mock()
+        skid_mock._get_county_names.return_value = pd.DataFrame(
+            {
+                "id_": ["1", "2"],
+                "facility_type": ["Recycling Facility - MRF", "Compost"],
+                "website": ["sheet.com", "sheet2.com"],
+                "not_in_live_layer": ["a", "b"],
+                "SHAPE": ["shape1", "shape2"],
+            }
+        )
+        facility_summary_df = pd.DataFrame(
+            {
+                "id_": ["1"],
+                "tons_of_material_diverted_from_": [10.0],
+                "tons_recycled_at_recycle_fac": [5.0],
+                "website": ["salesforce.com"],
+                "phone_no_": ["555"],
+                "accept_material_dropped_off_by_": ["Yes"],
+                "facility_name": ["Facility 1"],
+            }
+        )
+        gis_mock = mocker.Mock()
+
+        main.Skid._update_facilities(skid_mock, gis_mock, facility_summary_df, "working_dir")
+
+        gis_mock.content.get.assert_called_once_with(main.config.FACILITIES_LAYER_ITEMID)
+        loaded_df = updater_mock.return_value.truncate_and_load.call_args[0][0]
+        assert set(loaded_df.columns) == {
+            "id_",
+            "facility_type",
+            "website",
+            "tons_of_material_diverted_from_",
+            "SHAPE",
+            "type_filter",
+            "last_updated",
+        }
+        assert loaded_df.set_index("id_")["website"].to_dict() == {"1": "salesforce.com", "2": "sheet2.com"}
+        assert loaded_df.set_index("id_")["type_filter"].to_dict() == {"1": "Recycling Facility", "2": "Compost"}
+
 
 class TestCountyNamesMethod:
 
@@ -90,10 +182,140 @@ class TestCountyNamesMethod:
             },
             index=[1, 2],
         )
-        df_without_empty["latitude"] = df_without_empty["latitude"].astype(object)
-        df_without_empty["longitude"] = df_without_empty["longitude"].astype(object)
 
         # spatial_mock.from_xy.assert_called_once_with(df_without_empty, "longitude", "latitude")
         assert spatial_mock.from_xy.call_count == 1
         pd.testing.assert_frame_equal(spatial_mock.from_xy.call_args[0][0], df_without_empty)
         pd.testing.assert_frame_equal(spatial_mock.from_xy.call_args[0][0], df_without_empty)
+
+    def test_get_county_names_drops_zero_and_non_numeric_lat_long(self, mocker):
+        spatial_mock = mocker.patch("wmrc.main.pd.DataFrame.spatial")
+        mocker.patch("wmrc.main.arcgis")
+
+        input_df = pd.DataFrame(
+            {
+                "foo": [1, 2, 3, 4],
+                "latitude": ["0", "foo", None, -111.2],
+                "longitude": [41.0, 41.1, 41.15, "41.2"],
+            }
+        )
+
+        main.Skid._get_county_names(input_df, mocker.Mock())
+
+        assert spatial_mock.from_xy.call_args[0][0]["foo"].tolist() == [4]
+        assert spatial_mock.from_xy.call_args[0][0]["latitude"].tolist() == [-111.2]
+        assert spatial_mock.from_xy.call_args[0][0]["longitude"].tolist() == [41.2]
+
+
+class TestParseFromGoogleSheets:
+
+    def test_parse_from_google_sheets_keeps_open_facilities_and_renames_columns(self, mocker):
+        sw_df = pd.DataFrame(
+            {
+                "ID ": [1, 2],
+                "Status": ["Open", "Closed"],
+                "Longitude ": [-111.1, -111.2],
+                "Accept Material\n Dropped \n Off by the Public": ["Yes", "No"],
+            }
+        )
+        uocc_df = pd.DataFrame(
+            {
+                "ID ": [3],
+                "Status": ["OPEN"],
+                "Longitude ": [-111.3],
+                "Type": ["UOCC"],
+            }
+        )
+        gsheet_mock = mocker.patch("wmrc.main.extract.GSheetLoader").return_value
+        gsheet_mock.load_specific_worksheet_into_dataframe.side_effect = [sw_df, uocc_df]
+        skid_mock = mocker.Mock()
+
+        output = main.Skid._parse_from_google_sheets(skid_mock)
+
+        assert output["id_"].tolist() == ["1", "3"]
+        assert list(output.columns) == ["id_", "status", "longitude", "accept_material_dropped_off_by_", "class"]
+
+
+class TestSubscribe:
+
+    def test_subscribe_runs_facility_updates(self, mocker):
+        skid_mock = mocker.patch("wmrc.main.Skid")
+        validation_mock = mocker.patch("wmrc.main.run_validation")
+        cloud_event = mocker.Mock(data={"message": {"data": base64.b64encode(b"facility updates")}})
+
+        main.subscribe(cloud_event)
+
+        skid_mock.return_value.process.assert_called_once()
+        validation_mock.assert_not_called()
+
+    def test_subscribe_runs_validation(self, mocker):
+        skid_mock = mocker.patch("wmrc.main.Skid")
+        validation_mock = mocker.patch("wmrc.main.run_validation")
+        cloud_event = mocker.Mock(data={"message": {"data": base64.b64encode(b"validate")}})
+
+        main.subscribe(cloud_event)
+
+        validation_mock.assert_called_once()
+        skid_mock.assert_not_called()
+
+
+class TestRunUpdates:
+
+    def test_make_working_dir_creates_subdirectory(self, mocker, tmp_path):
+        skid_mock = mocker.Mock()
+        skid_mock.tempdir_path = tmp_path
+
+        working_dir = main.Skid._make_working_dir(skid_mock, "facilities")
+        main.Skid._make_working_dir(skid_mock, "facilities")
+
+        assert working_dir == tmp_path / "facilities"
+        assert working_dir.is_dir()
+
+    def test_run_updates_gives_each_update_its_own_gis_and_working_dir(self, mocker, tmp_path):
+        skid_mock = mocker.Mock()
+        skid_mock._make_working_dir.side_effect = lambda name: tmp_path / name
+        skid_mock._get_gis.side_effect = lambda: mocker.Mock()
+        facilities_mock = mocker.Mock(return_value=1)
+        materials_mock = mocker.Mock(return_value=2)
+
+        counts = main.Skid._run_updates(
+            skid_mock,
+            {
+                "facilities": (facilities_mock, "facility_df"),
+                "materials": (materials_mock, "materials_df", "itemid"),
+            },
+        )
+
+        assert counts == {"facilities": 1, "materials": 2}
+        facilities_gis, facilities_df = facilities_mock.call_args.args
+        materials_gis, materials_df, itemid = materials_mock.call_args.args
+        assert facilities_gis is not materials_gis
+        assert (facilities_df, materials_df, itemid) == ("facility_df", "materials_df", "itemid")
+        assert facilities_mock.call_args.kwargs == {"working_dir": tmp_path / "facilities"}
+        assert materials_mock.call_args.kwargs == {"working_dir": tmp_path / "materials"}
+
+    def test_run_updates_finishes_all_updates_and_reraises_error(self, mocker, tmp_path):
+        skid_mock = mocker.Mock()
+        skid_mock._make_working_dir.side_effect = lambda name: tmp_path / name
+        failing_mock = mocker.Mock(side_effect=ValueError("upload failed"))
+        other_mock = mocker.Mock(return_value=1)
+
+        with pytest.raises(ValueError, match="upload failed"):
+            main.Skid._run_updates(skid_mock, {"counties": (failing_mock,), "statewide": (other_mock,)})
+
+        other_mock.assert_called_once()
+        skid_mock.skid_logger.error.assert_any_call("Updating %s failed", "counties", exc_info=mocker.ANY)
+        skid_mock.skid_logger.error.assert_any_call("Layers that were updated successfully: %s", "statewide")
+
+    def test_update_statewide_adds_geometries_and_loads(self, mocker, tmp_path):
+        skid_mock = mocker.Mock()
+        spatial_df = mocker.Mock()
+        mocker.patch("wmrc.main.helpers.add_bogus_geometries", return_value=spatial_df)
+        updater_mock = mocker.patch("wmrc.main.load.ServiceUpdater")
+        updater_mock.return_value.truncate_and_load.return_value = 5
+
+        count = main.Skid._update_statewide(skid_mock, "gis", pd.DataFrame({"a": [1]}), working_dir=tmp_path)
+
+        assert count == 5
+        updater_mock.assert_called_once_with("gis", main.config.STATEWIDE_LAYER_ITEMID, working_dir=tmp_path)
+        updater_mock.return_value.truncate_and_load.assert_called_once_with(spatial_df)
@@ -1,4 +1,6 @@
+import numpy as np
 import pandas as pd
+import pytest
 
 from wmrc import yearly
 
@@ -38,6 +40,35 @@ class TestYearlyMetrics:
 
         pd.testing.assert_frame_equal(output, expected_output)
 
+    def test_county_wide_metrics_treats_missing_values_as_zero(self):
+        facility_year_df = pd.DataFrame(
+            {
+                "Municipal_Solid_Waste__c": [50, np.nan],
+                "Combined_Total_of_Material_Recycled__c": [10, 20],
+                "Total_Materials_sent_to_composting__c": [np.nan, 50],
+                "Total_Material_managed_by_ADC__c": [10, 0],
+                "Municipal_Waste_In_State_in_Tons__c": [80, 30],
+                "Cache_County__c": [100, np.nan],
+                "Utah_County__c": [np.nan, 100],
+            }
+        )
+
+        expected_output = pd.DataFrame(
+            {
+                "county_wide_msw_recycled": [5.0, 0.0, 5.0],
+                "county_wide_msw_composted": [0.0, 0.0, 0.0],
+                "county_wide_msw_digested": [5.0, 0.0, 5.0],
+                "county_wide_msw_landfilled": [80.0, 30.0, 110.0],
+                "county_wide_msw_diverted_total": [10.0, 0.0, 10.0],
+                "county_wide_msw_recycling_rate": [10 / 90 * 100, 0.0, 10 / 120 * 100],
+            },
+            index=["Cache_County__c", "Utah_County__c", "Statewide"],
+        )
+
+        output = yearly.county_summaries(facility_year_df, ["Cache_County__c", "Utah_County__c"])
+
+        pd.testing.assert_frame_equal(output, expected_output)
+
     def test_statewide_metrics_happy_path(self):
         input_df = pd.DataFrame(
             {
@@ -133,31 +164,6 @@ class TestRatesPerMaterial:
 
         assert output == ["Composts"]
 
-    def test_update_fields_moves_msw_to_end(self):
-        output = yearly._update_fields(["foo", "Municipal_Solid_Waste__c", "bar", "Out_of_State__c"])
-
-        assert output == ["foo", "bar", "Out_of_State__c", "Municipal_Solid_Waste__c"]
-
-    def test_update_fields_adds_msw(self):
-        output = yearly._update_fields(["foo", "bar", "Out_of_State__c"])
-
-        assert output == ["foo", "bar", "Out_of_State__c", "Municipal_Solid_Waste__c"]
-
-    def test_update_fields_adds_out_of_state(self):
-        output = yearly._update_fields(["foo", "bar", "Municipal_Solid_Waste__c"])
-
-        assert output == ["foo", "bar", "Out_of_State__c", "Municipal_Solid_Waste__c"]
-
-    def test_update_fields_adds_both(self):
-        output = yearly._update_fields(["foo", "bar"])
-
-        assert output == ["foo", "bar", "Out_of_State__c", "Municipal_Solid_Waste__c"]
-
-    def test_update_fields_reorders_both(self):
-        output = yearly._update_fields(["foo", "Municipal_Solid_Waste__c", "Out_of_State__c", "bar"])
-
-        assert output == ["foo", "bar", "Out_of_State__c", "Municipal_Solid_Waste__c"]
-
     def test_rates_per_material_sums_properly_no_modifiers(self):
         year_df = pd.DataFrame(
             {
@@ -297,3 +303,38 @@ class TestRatesPerMaterial:
         )
 
         pd.testing.assert_frame_equal(output, expected_output)
+
+    def test_rates_per_material_raises_on_modifier_fields(self):
+        year_df = pd.DataFrame(
+            {
+                "Classifications__c": ["Recycling"],
+                "Combined_Total_of_Material_Received__c": [100],
+                "Municipal_Solid_Waste__c": [100],
+                "Out_of_State__c": [0],
+            }
+        )
+
+        with pytest.raises(ValueError, match="Material fields should not include the modifier fields"):
+            yearly.rates_per_material(
+                year_df,
+                classification="Recycling",
+                fields=["Combined_Total_of_Material_Received__c", "Municipal_Solid_Waste__c"],
+                total_field="Combined_Total_of_Material_Received__c",
+            )
+
+    def test_rates_per_material_does_not_modify_fields(self):
+        year_df = pd.DataFrame(
+            {
+                "Classifications__c": ["Recycling"],
+                "Combined_Total_of_Material_Received__c": [100],
+                "Municipal_Solid_Waste__c": [100],
+                "Out_of_State__c": [0],
+            }
+        )
+        fields = ["Combined_Total_of_Material_Received__c"]
+
+        yearly.rates_per_material(
+            year_df, classification="Recycling", fields=fields, total_field="Combined_Total_of_Material_Received__c"
+        )
+
+        assert fields == ["Combined_Total_of_Material_Received__c"]